@@ -1,26 +1,73 @@
-from dash import Dash, html, dash_table, dcc, callback, Output, Input
+from dash import Dash, html, dash_table, dcc, callback, Output, Input, State, no_update
 import pandas as pd
 import dash_ag_grid as dag
 import plotly.express as px
 import json
+import logging
+import os
+from functools import lru_cache
 
-df = pd.read_csv('gapminder2007.csv')
+logger = logging.getLogger(__name__)
+
+# read the csv with pyarrow's multithreaded parser when it is installed
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pacsv
+except ImportError:
+    pa = pacsv = None
+
+if pacsv is None:
+    df = pd.read_csv('gapminder2007.csv')
+else:
+    # convert the csv to parquet once, later runs load the typed columns directly
+    if not os.path.exists('gapminder2007.parquet'):
+        pacsv.read_csv('gapminder2007.csv').to_pandas(types_mapper=pd.ArrowDtype).to_parquet('gapminder2007.parquet')
+    df = pd.read_parquet('gapminder2007.parquet', engine='pyarrow', dtype_backend='pyarrow')
+# repeated strings become integer codes, so grouping by continent is cheap
+df[['country', 'continent']] = df[['country', 'continent']].astype('category')
+# the populations fit in 32 bits, halving the bytes every groupby has to scan
+df['pop'] = pd.to_numeric(df['pop'], downcast='unsigned')
+
+
+def to_records(frame):
+    # pyarrow builds the row dicts in C from the columns instead of row by row
+    if pa is None:
+        return frame.to_dict('records')
+    return pa.Table.from_pandas(frame, preserve_index=False).to_pylist()
+
+
+records = to_records(df)
 # initialize the dash application
-with open('world-countries.json', 'r') as file:
-    geo_data = json.load(file)
-
-map2 = px.choropleth_map(
-    df,
-    geojson=geo_data,
-    color='lifeExp',
-    locations = 'country',
-    featureidkey='properties.name',
-    center = {'lat': 35, 'lon': -104},
-    zoom = 0.5
-)
+# orjson's C parser loads the geojson much faster than the json module
+try:
+    import orjson
+    with open('world-countries.json', 'rb') as file:
+        geo_data = orjson.loads(file.read())
+except ImportError:
+    with open('world-countries.json', 'r') as file:
+        geo_data = json.load(file)
+
+# only ship the country outlines the map can actually colour
+wanted = set(df['country'])
+geo_data['features'] = [f for f in geo_data['features'] if f['properties']['name'] in wanted]
+
+# the radio items and dropdown only switch between three columns,
+# so build every bar chart and box plot once instead of on each callback
+figure_columns = ['pop', 'lifeExp', 'gdpPercap']
+# average per continent up front so each bar chart only holds five bars
+continent_means = df.groupby('continent', observed=True)[figure_columns].mean().reset_index()
+bar_figures = {v: px.bar(continent_means, x = 'continent', y = v) for v in figure_columns}
+box_figures = {v: px.box(df, x = 'continent', y = v) for v in figure_columns}
+
+# read the folium map once and close the file handle
+with open('chigao_map.html', 'r') as file:
+    chicago_map_html = file.read()
 
 
 app = Dash()
+# expose the flask server so the app can run under gunicorn with several workers:
+# gunicorn -w 4 -k gthread --threads 8 "Lecture_2-dash-demo:server"
+server = app.server
 app.layout = [
     dcc.Markdown('''
         # Data Visualization Dashboard
@@ -28,12 +75,23 @@ app.layout = [
     html.Div(children = "My first dashboard"),
     html.Hr(), # this horizontal line
     dcc.RadioItems(options=['pop', 'lifeExp', 'gdpPercap'], value='pop', id = 'radio-item'),
-    dash_table.DataTable(data=df.to_dict('records'), page_size= 10),
+    # virtualized so only the rows in view are rendered
+    dash_table.DataTable(
+        data=records,
+        page_action='none',
+        virtualization=True,
+        fixed_rows={'headers': True},
+        style_table={'height': '400px', 'overflowY': 'auto'}
+    ),
     dcc.Graph(figure = {}, id = 'figure-1'),
 
     # add new components
     dcc.Dropdown(['pop', 'lifeExp', 'gdpPercap'], value = 'pop', id = 'drop-down'),
     dcc.Graph(figure = {}, id = 'figure-2'),
+    dcc.Store(id = 'figs', data = {
+        'bar': {v: fig.to_dict() for v, fig in bar_figures.items()},
+        'box': {v: fig.to_dict() for v, fig in box_figures.items()}
+    }),
 
     dcc.Checklist(
         ['lifeExp', 'gdpPercap'],
@@ -43,20 +101,21 @@ app.layout = [
 
     html.Div([
         html.Div([
-            dcc.Graph(figure = px.box(df, x = 'continent', y = 'lifeExp'), id = 'figure-3')
+            dcc.Graph(figure = box_figures['lifeExp'], id = 'figure-3')
         ], style = {'width': '49%', 'display': 'inline-block'}),
 
 
         html.Div([
-            dcc.Graph(figure = px.box(df, x = 'continent', y = 'gdpPercap'), id = 'figure-4')
+            dcc.Graph(figure = box_figures['gdpPercap'], id = 'figure-4')
         ], style = {'width': '49%', 'display': 'inline-block'})
     ]),
 
     dag.AgGrid(
         id = 'ag-grid',
-        rowData=df.to_dict('records'),
         columnDefs= [{'field':i} for i in df.columns], 
-        dashGridOptions={'rowSelection': 'single'}
+        rowModelType='infinite',
+        getRowId='params.data.country',
+        dashGridOptions={'rowSelection': 'single', 'cacheBlockSize': 100}
     ),
 
     html.Div(children="Highlight Information", style = {
@@ -65,32 +124,95 @@ app.layout = [
         'fontSize': 30}, id = 'hightlight'
     ),
 
-    html.Iframe(id = 'map-1', srcDoc = open('chigao_map.html', 'r').read(), width = "80%", height= '660'),
-    dcc.Graph(figure=map2)
+    html.Iframe(id = 'map-1', srcDoc = chicago_map_html, width = "80%", height= '660'),
+    # the geojson is sent once in a store and the map is assembled in the browser
+    dcc.Store(id = 'geo', data = geo_data),
+    dcc.Store(id = 'map-data', data = {'locations': df['country'].tolist(), 'z': df['lifeExp'].tolist()}),
+    dcc.Graph(figure = {}, id = 'map-2')
 ]
 
+# the same few countries get selected over and over, so reuse their labels
+@lru_cache(maxsize=256)
+def highlight_text(country):
+    return "Selected Country: " + country
+
 # callback functions
-@callback(
+# the figures are prebuilt, so pick them in the browser without a server round trip
+app.clientside_callback(
+    "function(value, figs) { return figs.bar[value]; }",
     Output(component_id='figure-1', component_property='figure'),
-    Output(component_id= 'figure-2', component_property= 'figure'),
-    Output(component_id= 'hightlight', component_property= 'children'),
     Input(component_id='radio-item', component_property='value'),
+    State(component_id='figs', component_property='data')
+)
+
+app.clientside_callback(
+    "function(value, figs) { return figs.box[value]; }",
+    Output(component_id= 'figure-2', component_property= 'figure'),
     Input(component_id = "drop-down", component_property= "value"),
+    State(component_id='figs', component_property='data')
+)
+
+app.clientside_callback(
+    """
+    function(geo, values) {
+        return {
+            data: [{
+                type: 'choroplethmap',
+                geojson: geo,
+                featureidkey: 'properties.name',
+                locations: values.locations,
+                z: values.z,
+                colorbar: {title: {text: 'lifeExp'}}
+            }],
+            layout: {
+                map: {center: {lat: 35, lon: -104}, zoom: 0.5},
+                margin: {t: 0, r: 0, b: 0, l: 0}
+            }
+        };
+    }
+    """,
+    Output(component_id='map-2', component_property='figure'),
+    Input(component_id='geo', component_property='data'),
+    Input(component_id='map-data', component_property='data')
+)
+
+
+# the infinite row model leaves sorting to the server, so sort once per
+# header combination and reuse it for every block of that ordering
+@lru_cache(maxsize=32)
+def sorted_rows(sort_key):
+    if not sort_key:
+        return df
+    return df.sort_values([col for col, _ in sort_key],
+                          ascending=[order == 'asc' for _, order in sort_key],
+                          kind='stable')
+
+
+# hand the grid one block of rows at a time as it scrolls
+@callback(
+    Output(component_id = "ag-grid", component_property= "getRowsResponse"),
+    Input(component_id = "ag-grid", component_property= "getRowsRequest")
+)
+def serve_grid_rows(request):
+    if request is None:
+        return no_update
+    sort_key = tuple((s['colId'], s['sort']) for s in request.get('sortModel') or [])
+    block = sorted_rows(sort_key).iloc[request['startRow']:request['endRow']]
+    return {'rowData': to_records(block), 'rowCount': len(df)}
+
+
+@callback(
+    Output(component_id= 'hightlight', component_property= 'children'),
     Input(component_id = "ag-grid", component_property= "selectedRows")
 )
-def update_layout(radio_item_value, drop_down_value, select_row_value):
-    
-    print(select_row_value)
-    highlight_result = "Selected Country: "
-    if select_row_value == None:
-        highlight_result = "No country selected"
-    else:
-        highlight_result = highlight_result + select_row_value[0]['country']
-    fig1 = px.histogram(df, x = 'continent', y = radio_item_value, histfunc= 'avg')
-    fig2 = px.box(df, x = 'continent', y = drop_down_value)
-    return fig1, fig2, highlight_result
+def update_highlight(select_row_value):
+    logger.debug("selected=%s", select_row_value)
+    if not select_row_value:
+        return "No country selected"
+    return highlight_text(select_row_value[0]['country'])
 
 
 if __name__ == '__main__':
-    app.run(host = '0.0.0.0', port = 8050, debug=True)
+    # set DASH_DEBUG=1 to get the dev tools back while working on the app
+    app.run(host = '0.0.0.0', port = 8050, debug=os.getenv('DASH_DEBUG') == '1', dev_tools_hot_reload=False)
     # 0.0.0.0 ask to listen to all available networks, making it more accessible
\ No newline at end of file
@@ -0,0 +1,41 @@
+// Builds the key indicator cards from the numbers sent by update_key_metrics,
+// so only six floats travel over the wire instead of the whole card markup.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    metrics: {
+        renderKeyMetrics: function(data) {
+            var cards = [
+                {label: 'Prevalence per 100,000', className: 'text-primary'},
+                {label: 'Mortality per 100,000', className: 'text-danger'},
+                {label: 'Incidence per 100,000', className: 'text-warning'}
+            ];
+
+            function component(type, props) {
+                return {type: type, namespace: 'dash_html_components', props: props};
+            }
+
+            if (!data) {
+                return [component('Div', {
+                    children: 'No data available for the selected country and year range.',
+                    className: 'col-12'
+                })];
+            }
+
+            return cards.map(function(card, i) {
+                var value = data.values[i];
+                var change = data.changes[i];
+                var changeIndicator = change !== 0 ? component('Div', {children: [
+                    component('Span', {children: change.toFixed(1) + '% ', className: 'mr-1'}),
+                    component('I', {className: change < 0 ? 'fas fa-arrow-down text-success' : 'fas fa-arrow-up text-danger'})
+                ]}) : component('Span', {children: 'No change'});
+
+                return component('Div', {className: 'col-md-4 mb-3', children: [
+                    component('Div', {className: 'd-flex justify-content-between', children: [
+                        component('H2', {children: value.toFixed(1), className: 'mb-0 font-weight-bold ' + card.className}),
+                        changeIndicator
+                    ]}),
+                    component('P', {children: card.label, className: 'text-muted mb-0'})
+                ]});
+            });
+        }
+    }
+});
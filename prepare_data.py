@@ -0,0 +1,53 @@
+import pandas as pd
+
+# TB metric columns (rates per 100,000 population with their confidence bounds)
+metric_columns = [
+    'prevalence_per_100k', 'prevalence_per_100k_low', 'prevalence_per_100k_high',
+    'mortality_per_100k', 'mortality_per_100k_low', 'mortality_per_100k_high',
+    'incidence_per_100k', 'incidence_per_100k_low', 'incidence_per_100k_high',
+]
+
+# The headline metrics shown in the dashboard's cards, charts and table
+key_metrics = ['prevalence_per_100k', 'mortality_per_100k', 'incidence_per_100k']
+
+# Read the WHO CSV and apply the renames and dtype conversions used by the dashboard
+def prepare_tb_data(csv_path='1-TB_Burden_Country.csv'):
+    # pyarrow parses the CSV and backs the columns with Arrow memory
+    tb_data = pd.read_csv(csv_path, engine='pyarrow', dtype_backend='pyarrow')
+
+    # Clean and preprocess the data
+    tb_data.rename(columns={
+        'Country or territory name': 'country',
+        'ISO 3-character country/territory code': 'iso_code',
+        'Region': 'region',
+        'Year': 'year',
+        'Estimated total population number': 'population',
+        'Estimated prevalence of TB (all forms) per 100 000 population': 'prevalence_per_100k',
+        'Estimated prevalence of TB (all forms) per 100 000 population, low bound': 'prevalence_per_100k_low',
+        'Estimated prevalence of TB (all forms) per 100 000 population, high bound': 'prevalence_per_100k_high',
+        'Estimated mortality of TB cases (all forms, excluding HIV) per 100 000 population': 'mortality_per_100k',
+        'Estimated mortality of TB cases (all forms, excluding HIV), per 100 000 population, low bound': 'mortality_per_100k_low',
+        'Estimated mortality of TB cases (all forms, excluding HIV), per 100 000 population, high bound': 'mortality_per_100k_high',
+        'Estimated incidence (all forms) per 100 000 population': 'incidence_per_100k',
+        'Estimated incidence (all forms) per 100 000 population, low bound': 'incidence_per_100k_low',
+        'Estimated incidence (all forms) per 100 000 population, high bound': 'incidence_per_100k_high',
+    }, inplace=True)
+
+    # Store the repeated text columns as categoricals so filtering and grouping work on integer codes
+    for column in ['country', 'region', 'iso_code']:
+        tb_data[column] = tb_data[column].astype('category')
+
+    # Convert the TB metrics from Arrow to NumPy floats for the column-wise means computed in the callbacks.
+    # The headline metrics stay float64: in float32 their means round the other way at the half-step
+    # in the table. Only the confidence bounds are float32, which halves the bytes read for them
+    bound_columns = [column for column in metric_columns if column not in key_metrics]
+    tb_data[key_metrics] = tb_data[key_metrics].astype('float64')
+    tb_data[bound_columns] = tb_data[bound_columns].astype('float32')
+    tb_data['population'] = tb_data['population'].astype('int32')
+
+    return tb_data
+
+if __name__ == '__main__':
+    # Save the preprocessed data so the dashboard workers can skip CSV parsing at startup
+    prepare_tb_data().to_parquet('tb.parquet', engine='pyarrow')
+    print("Preprocessed data saved to tb.parquet")
@@ -1,58 +1,83 @@
 import dash
-from dash import Dash, html, dash_table, dcc, callback, Output, Input, State
+from dash import Dash, html, dash_table, dcc, callback, Output, Input, State, ClientsideFunction
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import json
 import numpy as np
-from flask_caching import Cache
+from functools import lru_cache
 import datetime
+import os
+from prepare_data import prepare_tb_data, metric_columns, key_metrics
 
-# Load the TB data
-tb_data = pd.read_csv('1-TB_Burden_Country.csv')
+# Load the preprocessed TB data (run prepare_data.py once to create tb.parquet),
+# falling back to preparing it from the CSV
+parquet_sources = ['1-TB_Burden_Country.csv', 'prepare_data.py']
+if not os.path.exists('tb.parquet'):
+    tb_data = prepare_tb_data('1-TB_Burden_Country.csv')
+elif any(os.path.getmtime(path) > os.path.getmtime('tb.parquet') for path in parquet_sources):
+    # The CSV or the preprocessing changed since tb.parquet was written, so rebuild it
+    # (written to a temporary file first so other workers never read a half-written file)
+    tb_data = prepare_tb_data('1-TB_Burden_Country.csv')
+    tmp_path = f'tb.parquet.{os.getpid()}.tmp'
+    tb_data.to_parquet(tmp_path, engine='pyarrow')
+    os.replace(tmp_path, 'tb.parquet')
+else:
+    tb_data = pd.read_parquet('tb.parquet', engine='pyarrow')
 
-# Load the geographic data
-with open('world-countries.json', 'r') as file:
-    geo_data = json.load(file)
-
-# Clean and preprocess the data
-tb_data.rename(columns={
-    'Country or territory name': 'country',
-    'ISO 3-character country/territory code': 'iso_code',
-    'Region': 'region',
-    'Year': 'year',
-    'Estimated total population number': 'population',
-    'Estimated prevalence of TB (all forms) per 100 000 population': 'prevalence_per_100k',
-    'Estimated prevalence of TB (all forms) per 100 000 population, low bound': 'prevalence_per_100k_low',
-    'Estimated prevalence of TB (all forms) per 100 000 population, high bound': 'prevalence_per_100k_high',
-    'Estimated mortality of TB cases (all forms, excluding HIV) per 100 000 population': 'mortality_per_100k',
-    'Estimated mortality of TB cases (all forms, excluding HIV), per 100 000 population, low bound': 'mortality_per_100k_low',
-    'Estimated mortality of TB cases (all forms, excluding HIV), per 100 000 population, high bound': 'mortality_per_100k_high',
-    'Estimated incidence (all forms) per 100 000 population': 'incidence_per_100k',
-    'Estimated incidence (all forms) per 100 000 population, low bound': 'incidence_per_100k_low',
-    'Estimated incidence (all forms) per 100 000 population, high bound': 'incidence_per_100k_high',
-}, inplace=True)
+# Display names of the key metrics, built once: the short name ('Prevalence') and the axis label ('Prevalence per 100k')
+metric_names = {metric: metric.split('_')[0].capitalize() for metric in key_metrics}
+metric_labels = {metric: metric.replace('_', ' ').capitalize() for metric in key_metrics}
 
 # Get the list of available years
 years = sorted(tb_data['year'].unique())
 latest_year = years[-1]
 prev_year = years[-2] if len(years) > 1 else years[-1]
 
-# Get the list of regions and countries
-regions = sorted(tb_data['region'].unique())
-countries = sorted(tb_data['country'].unique())
+# Get the list of regions and countries from the categories, without scanning every row
+regions = sorted(tb_data['region'].cat.categories.tolist())
+countries = sorted(tb_data['country'].cat.categories.tolist())
+
+# Build the dropdown options once; the country list is shared by two dropdowns
+country_options = [{'label': country, 'value': country} for country in countries]
+region_options = [{'label': region, 'value': region} for region in regions]
+
+# Average every metric per year in a single pass, for the global indicators and trend
+yearly_means = tb_data.groupby('year')[metric_columns].mean()
+
+# Sum and count the key metrics per region and year once, so the region charts can average
+# any year range over these few dozen rows instead of regrouping every country
+region_year_groups = tb_data.groupby(['region', 'year'], observed=True)[key_metrics]
+region_year_sums = region_year_groups.sum()
+region_year_counts = region_year_groups.count()
+
+# Sort the rows by year once so any year range is a contiguous slice
+tb_by_year = tb_data.sort_values('year', kind='stable').reset_index(drop=True)
+year_array = tb_by_year['year'].to_numpy()
 
-# Create a function to calculate percent change
-# def calc_percent_change(df, country, metric, year1, year2):
-#     try:
-#         val1 = df[(df['country'] == country) & (df['year'] == year1)][metric].iloc[0]
-#         val2 = df[(df['country'] == country) & (df['year'] == year2)][metric].iloc[0]
-#         if val1 == 0:
-#             return "N/A"
-#         return ((val2 - val1) / val1) * 100
-#     except:
-#         return "N/A"
+# Index the data by country and year so single values and whole countries can be looked up directly
+tb_indexed = tb_data.set_index(['country', 'year']).sort_index()
+
+# Compute every country's year-over-year % change for the key metrics in one vectorized pass
+# (years are contiguous for every country, so each row is compared with the previous year)
+yoy_percent_change = tb_indexed.groupby(level='country', observed=True, sort=False)[key_metrics].pct_change(fill_method=None) * 100
+
+# Look up the percent change of a metric for a country from the previous year to the given year
+def calc_percent_change(country, metric, year):
+    try:
+        change = yoy_percent_change.at[(country, year), metric]
+    except KeyError:
+        return "N/A"
+    # No previous year, or a previous value of 0
+    if not np.isfinite(change):
+        return "N/A"
+    return change
+
+# Percent change between consecutive yearly means (NaN for the first year)
+def yoy_percent(values):
+    out = np.full_like(values, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[1:] = (values[1:] - values[:-1]) / values[:-1] * 100
+    return out
 
 # External stylesheets
 external_stylesheets = [
@@ -173,18 +198,14 @@ app.index_string = '''
 </html>
 '''
 
-# Setup cache for performance optimization
-cache = Cache(app.server, config={
-    'CACHE_TYPE': 'FileSystemCache',
-    'CACHE_DIR': 'cache-directory',
-    'CACHE_DEFAULT_TIMEOUT': 3600  # 1 hour cache timeout
-})
-
-# Cache the expensive data processing operations
-@cache.memoize()
+# Cache the expensive data processing operations in memory
+# (regions must be passed as a tuple so the arguments are hashable)
+@lru_cache(maxsize=256)
 def get_filtered_data(start_year, end_year, regions=None):
-    # Filter data by year range
-    filtered_data = tb_data[(tb_data['year'] >= start_year) & (tb_data['year'] <= end_year)]
+    # Filter data by year range with a binary search on the year-sorted rows
+    lo = np.searchsorted(year_array, start_year, 'left')
+    hi = np.searchsorted(year_array, end_year, 'right')
+    filtered_data = tb_by_year.iloc[lo:hi]
     
     # Filter by regions if selected
     if regions and len(regions) > 0:
@@ -192,6 +213,20 @@ def get_filtered_data(start_year, end_year, regions=None):
         
     return filtered_data
 
+# Cache the per-country means shown on the map
+@lru_cache(maxsize=256)
+def get_country_means(metric, start_year, end_year, regions=None):
+    filtered_data = get_filtered_data(start_year, end_year, regions)
+    return filtered_data.groupby('country', observed=True, sort=False)[metric].mean().reset_index()
+
+# Average the key metrics per region over a year range from the precomputed sums and counts
+@lru_cache(maxsize=256)
+def get_region_means(start_year, end_year):
+    year_rows = (slice(None), slice(start_year, end_year))
+    sums = region_year_sums.loc[year_rows, :].groupby(level='region', observed=True, sort=False).sum()
+    counts = region_year_counts.loc[year_rows, :].groupby(level='region', observed=True, sort=False).sum()
+    return (sums / counts).reset_index()
+
 # App layout with WHO-inspired design and left sidebar
 app.layout = html.Div([
     # Header section
@@ -204,7 +239,7 @@ app.layout = html.Div([
         ], className="col-md-8"),
         html.Div([
             html.Div([
-                html.Img(src="data:image/svg+xml;base64,PHN2ZyB3aWR0aD0iMTAwIiBoZWlnaHQ9IjYwIiB2aWV3Qm94PSIwIDAgMTAwIDYwIiB4bWxucz0iaHR0cDovL3d3dy53My5vcmcvMjAwMC9zdmciPjx0ZXh0IHg9IjUwIiB5PSIzNSIgZm9udC1mYW1pbHk9IkFyaWFsLCBzYW5zLXNlcmlmIiBmb250LXNpemU9IjE4IiBmb250LXdlaWdodD0iYm9sZCIgZmlsbD0iIzAwNWI4MiIgdGV4dC1hbmNob3I9Im1pZGRsZSI+V0hPPC90ZXh0Pjx0ZXh0IHg9IjUwIiB5PSI1MCIgZm9udC1mYW1pbHk9IkFyaWFsLCBzYW5zLXNlcmlmIiBmb250LXNpemU9IjEwIiBmaWxsPSIjNjY2IiB0ZXh0LWFuY2hvcj0ibWlkZGxlIj5EYXRhIFNvdXJjZTwvdGV4dD48L3N2Zz4=", 
+                html.Img(src=app.get_asset_url('who-logo.svg'), 
                         height="60px", 
                         style={'float': 'right'},
                         title="World Health Organization - Data Source")
@@ -224,7 +259,7 @@ app.layout = html.Div([
                     html.Label("Select Country", className="filter-label"),
                     dcc.Dropdown(
                         id='country-filter',
-                        options=[{'label': country, 'value': country} for country in countries],
+                        options=country_options,
                         value='Global',
                         style={'width': '100%', 'zIndex': '10000'},
                         placeholder="Select a country",
@@ -238,7 +273,7 @@ app.layout = html.Div([
                     html.Label("Filter by Region", className="filter-label"),
                     dcc.Dropdown(
                         id='region-filter',
-                        options=[{'label': region, 'value': region} for region in regions],
+                        options=region_options,
                         value=None,
                         placeholder="All Regions",
                         multi=True,
@@ -287,6 +322,7 @@ app.layout = html.Div([
             html.Div([
                 html.H4(id='key-indicators-title', className="mb-3 text-secondary"),
                 html.Div(id='key-metrics', className="row"),
+                dcc.Store(id='key-metrics-data'),
                 html.Div([
                     html.P("Note: % changes compare the selected end year with the previous year (end year - 1).", 
                           className="text-muted small mt-2 mb-0")
@@ -362,7 +398,7 @@ app.layout = html.Div([
                             html.H5("Country Comparison", className="text-secondary mb-3"),
                             dcc.Dropdown(
                                 id='comparison-countries',
-                                options=[{'label': country, 'value': country} for country in countries],
+                                options=country_options,
                                 value=['Afghanistan', 'Brazil', 'China', 'India', 'South Africa'],
                                 multi=True,
                                 style={'width': '100%', 'marginBottom': '20px'}
@@ -500,98 +536,95 @@ def update_key_indicators_title(country, years_range):
 
 # Callback for key metrics
 @callback(
-    Output('key-metrics', 'children'),
+    Output('key-metrics-data', 'data'),
     [Input('country-filter', 'value'),
      Input('year-slider', 'value')]
 )
 def update_key_metrics(country, years_range):
     start_year, end_year = int(years_range[0]), int(years_range[1])
     
-    filtered_data = get_filtered_data(start_year, end_year)
-    
     # For global stats
     if not country or country == 'Global':
-        latest_year_data = filtered_data[filtered_data['year'] == end_year]
-        prev_year_data = filtered_data[filtered_data['year'] == end_year-1] if end_year > start_year else None
-        
-        # Calculate global averages
-        avg_prevalence = latest_year_data['prevalence_per_100k'].mean()
-        avg_mortality = latest_year_data['mortality_per_100k'].mean()
-        avg_incidence = latest_year_data['incidence_per_100k'].mean()
+        # Look up the global averages of all three metrics at once
+        latest_means = yearly_means.loc[end_year, key_metrics]
+        avg_prevalence, avg_mortality, avg_incidence = latest_means
         
         # Calculate year-over-year changes
-        if prev_year_data is not None:
-            prev_avg_prevalence = prev_year_data['prevalence_per_100k'].mean()
-            prev_avg_mortality = prev_year_data['mortality_per_100k'].mean()
-            prev_avg_incidence = prev_year_data['incidence_per_100k'].mean()
-            
-            prevalence_change = ((avg_prevalence - prev_avg_prevalence) / prev_avg_prevalence * 100) if prev_avg_prevalence > 0 else 0
-            mortality_change = ((avg_mortality - prev_avg_mortality) / prev_avg_mortality * 100) if prev_avg_mortality > 0 else 0
-            incidence_change = ((avg_incidence - prev_avg_incidence) / prev_avg_incidence * 100) if prev_avg_incidence > 0 else 0
+        if end_year > start_year:
+            prev_means = yearly_means.loc[end_year - 1, key_metrics]
+            changes = ((latest_means - prev_means) / prev_means * 100).where(prev_means > 0, 0)
+            prevalence_change, mortality_change, incidence_change = changes
         else:
             prevalence_change = mortality_change = incidence_change = 0
     else:
         # For specific country
-        country_data = filtered_data[filtered_data['country'] == country]
-        latest_country_data = country_data[country_data['year'] == end_year]
-        prev_year_country_data = country_data[country_data['year'] == end_year-1] if end_year > start_year else None
-        
-        if latest_country_data.empty:
-            return [html.Div("No data available for the selected country and year range.", className="col-12")]
-        
-        avg_prevalence = latest_country_data['prevalence_per_100k'].iloc[0] if not latest_country_data.empty else 0
-        avg_mortality = latest_country_data['mortality_per_100k'].iloc[0] if not latest_country_data.empty else 0
-        avg_incidence = latest_country_data['incidence_per_100k'].iloc[0] if not latest_country_data.empty else 0
+        try:
+            avg_prevalence, avg_mortality, avg_incidence = [
+                tb_indexed.at[(country, end_year), metric] for metric in key_metrics
+            ]
+        except KeyError:
+            return None
         
         # Calculate year-over-year changes
-        if prev_year_country_data is not None and not prev_year_country_data.empty:
-            prev_avg_prevalence = prev_year_country_data['prevalence_per_100k'].iloc[0]
-            prev_avg_mortality = prev_year_country_data['mortality_per_100k'].iloc[0]
-            prev_avg_incidence = prev_year_country_data['incidence_per_100k'].iloc[0]
-            
-            prevalence_change = ((avg_prevalence - prev_avg_prevalence) / prev_avg_prevalence * 100) if prev_avg_prevalence > 0 else 0
-            mortality_change = ((avg_mortality - prev_avg_mortality) / prev_avg_mortality * 100) if prev_avg_mortality > 0 else 0
-            incidence_change = ((avg_incidence - prev_avg_incidence) / prev_avg_incidence * 100) if prev_avg_incidence > 0 else 0
+        if end_year > start_year:
+            changes = [
+                calc_percent_change(country, metric, end_year)
+                for metric in key_metrics
+            ]
+            prevalence_change, mortality_change, incidence_change = [0 if change == "N/A" else change for change in changes]
         else:
             prevalence_change = mortality_change = incidence_change = 0
     
-    # Create metric cards
-    metrics = [
-        html.Div([
-            html.Div([
-                html.H2(f"{avg_prevalence:.1f}", className="mb-0 font-weight-bold text-primary"),
-                html.Div([
-                    html.Span(f"{prevalence_change:.1f}% ", className="mr-1"),
-                    html.I(className="fas fa-arrow-down text-success" if prevalence_change < 0 else "fas fa-arrow-up text-danger")
-                ]) if prevalence_change != 0 else html.Span("No change")
-            ], className="d-flex justify-content-between"),
-            html.P("Prevalence per 100,000", className="text-muted mb-0")
-        ], className="col-md-4 mb-3"),
-        
-        html.Div([
-            html.Div([
-                html.H2(f"{avg_mortality:.1f}", className="mb-0 font-weight-bold text-danger"),
-                html.Div([
-                    html.Span(f"{mortality_change:.1f}% ", className="mr-1"),
-                    html.I(className="fas fa-arrow-down text-success" if mortality_change < 0 else "fas fa-arrow-up text-danger")
-                ]) if mortality_change != 0 else html.Span("No change")
-            ], className="d-flex justify-content-between"),
-            html.P("Mortality per 100,000", className="text-muted mb-0")
-        ], className="col-md-4 mb-3"),
-        
-        html.Div([
-            html.Div([
-                html.H2(f"{avg_incidence:.1f}", className="mb-0 font-weight-bold text-warning"),
-                html.Div([
-                    html.Span(f"{incidence_change:.1f}% ", className="mr-1"),
-                    html.I(className="fas fa-arrow-down text-success" if incidence_change < 0 else "fas fa-arrow-up text-danger")
-                ]) if incidence_change != 0 else html.Span("No change")
-            ], className="d-flex justify-content-between"),
-            html.P("Incidence per 100,000", className="text-muted mb-0")
-        ], className="col-md-4 mb-3"),
-    ]
-    
-    return metrics
+    # Send only the numbers; assets/metrics.js builds the metric cards in the browser
+    return {
+        'values': [float(avg_prevalence), float(avg_mortality), float(avg_incidence)],
+        'changes': [float(prevalence_change), float(mortality_change), float(incidence_change)],
+    }
+
+# Render the key metric cards in the browser (see assets/metrics.js)
+app.clientside_callback(
+    ClientsideFunction(namespace='metrics', function_name='renderKeyMetrics'),
+    Output('key-metrics', 'children'),
+    Input('key-metrics-data', 'data')
+)
+
+# Static layouts of the trend and region charts, validated once at startup;
+# the figure builders only fill in the titles that depend on the inputs
+trend_layout = go.Layout(
+    title=dict(x=0.5, xanchor='center'),
+    xaxis=dict(title='Year', gridcolor='lightgray'),
+    yaxis=dict(gridcolor='lightgray'),
+    legend=dict(orientation='h', yanchor='top', y=-0.15, xanchor='center', x=0.5),
+    plot_bgcolor='white',
+    margin=dict(l=10, r=10, t=50, b=60),
+    hovermode='x unified'
+)
+
+region_distribution_layout = go.Layout(
+    title=dict(x=0.5, xanchor='center'),
+    xaxis=dict(gridcolor='lightgray'),
+    yaxis=dict(title='WHO Region', gridcolor='lightgray'),
+    plot_bgcolor='white',
+    margin=dict(l=10, r=10, t=50, b=30)
+)
+
+region_bar_layout = go.Layout(
+    title=dict(x=0.5, xanchor='center'),
+    xaxis=dict(title='WHO Region', tickangle=-45, gridcolor='lightgray'),
+    yaxis=dict(title='Rate per 100,000 population', gridcolor='lightgray'),
+    barmode='group',
+    plot_bgcolor='white',
+    margin=dict(l=10, r=10, t=50, b=120),
+    legend=dict(orientation='h', yanchor='top', y=-0.25, xanchor='center', x=0.5)
+)
+
+region_box_layout = go.Layout(
+    xaxis=dict(title='WHO Region', tickangle=-45, gridcolor='lightgray'),
+    yaxis=dict(gridcolor='lightgray'),
+    plot_bgcolor='white',
+    margin=dict(l=10, r=10, t=50, b=80),
+    showlegend=False
+)
 
 # Callback for choropleth map
 @callback(
@@ -601,13 +634,13 @@ def update_key_metrics(country, years_range):
      Input('year-slider', 'value')]
 )
 def update_map(selected_metric, selected_regions, selected_years):
-    start_year, end_year = int(selected_years[0]), int(selected_years[1])
-    
-    # Get filtered data using cached function
-    filtered_data = get_filtered_data(start_year, end_year, selected_regions)
-    
-    # Group by country and calculate the mean for the selected metric
-    agg_data = filtered_data.groupby('country')[selected_metric].mean().reset_index()
+    return build_map_figure(selected_metric, tuple(selected_regions or []), int(selected_years[0]), int(selected_years[1]))
+
+# Build the choropleth map figure, cached per metric, region selection and year range
+@lru_cache(maxsize=64)
+def build_map_figure(selected_metric, selected_regions, start_year, end_year):
+    # Get the per-country means using cached function
+    agg_data = get_country_means(selected_metric, start_year, end_year, tuple(sorted(selected_regions or [])))
     
     # Create colorscale based on the selected metric
     if selected_metric == 'prevalence_per_100k':
@@ -633,20 +666,23 @@ def update_map(selected_metric, selected_regions, selected_years):
         title = base_title
     
     # Create the choropleth map
-    fig = px.choropleth(
-        agg_data, 
-        locations="country", 
+    fig = go.Figure(go.Choropleth(
+        locations=agg_data['country'].to_numpy(),
         locationmode="country names",
-        color=selected_metric,
-        hover_name="country",
-        hover_data={selected_metric: True},
-        color_continuous_scale=colorscale,
-        projection="natural earth",
-        title=title
-    )
+        z=agg_data[selected_metric].to_numpy(),
+        colorscale=colorscale,
+        hovertext=agg_data['country'].to_numpy(),
+        hovertemplate='<b>%{hovertext}</b><br><br>country=%{location}<br>' + selected_metric + '=%{z}<extra></extra>',
+        colorbar=dict(
+            title=metric_labels[selected_metric],
+            ticksuffix=' per 100K',
+            len=0.8
+        )
+    ))
     
     # Update layout
     fig.update_geos(
+        projection_type="natural earth",
         showcoastlines=True,
         coastlinecolor="Black",
         showland=True,
@@ -661,11 +697,6 @@ def update_map(selected_metric, selected_regions, selected_years):
     
     fig.update_layout(
         margin=dict(l=0, r=0, t=30, b=0),
-        coloraxis_colorbar=dict(
-            title=selected_metric.replace('_', ' ').capitalize(),
-            ticksuffix=' per 100K',
-            len=0.8
-        ),
         legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
         title=dict(
             text=title,
@@ -675,7 +706,7 @@ def update_map(selected_metric, selected_regions, selected_years):
         )
     )
     
-    return fig
+    return fig.to_dict()
 
 # Callback for trend chart
 @callback(
@@ -684,46 +715,50 @@ def update_map(selected_metric, selected_regions, selected_years):
      Input('metric-selector', 'value')]
 )
 def update_trend_chart(selected_country, selected_metric):
+    return build_trend_figure(selected_country, selected_metric)
+
+# Build the trend chart figure, cached per country and metric
+@lru_cache(maxsize=64)
+def build_trend_figure(selected_country, selected_metric):
     # If no country selected or "Global", show global trend
     if not selected_country or selected_country == 'Global':
-        # Group by year and calculate mean for all countries
-        trend_data = tb_data.groupby('year')[
+        # Take the precomputed yearly means for all countries
+        trend_data = yearly_means[
             [selected_metric, f"{selected_metric}_low", f"{selected_metric}_high"]
-        ].mean().reset_index()
-        title = f'Global TB {selected_metric.split("_")[0].capitalize()} Trend'
+        ].reset_index()
+        title = f'Global TB {metric_names[selected_metric]} Trend'
     else:
-        # Filter data for selected country
-        country_data = tb_data[tb_data['country'] == selected_country]
-        if country_data.empty:
+        # Look up the selected country in the country-indexed data
+        if selected_country not in tb_indexed.index.levels[0]:
             # Return empty figure if no data
-            return go.Figure()
+            return go.Figure().to_dict()
         
-        trend_data = country_data
-        title = f'TB {selected_metric.split("_")[0].capitalize()} Trend for {selected_country}'
+        trend_data = tb_indexed.loc[selected_country].reset_index()
+        title = f'TB {metric_names[selected_metric]} Trend for {selected_country}'
     
     # Create figure with confidence interval
-    fig = go.Figure()
+    fig = go.Figure(layout=trend_layout)
     
     # Add main line
-    fig.add_trace(go.Scatter(
+    fig.add_trace(go.Scattergl(
         x=trend_data['year'],
         y=trend_data[selected_metric],
         mode='lines+markers',
-        name=selected_metric.replace('_per_100k', '').capitalize(),
+        name=metric_names[selected_metric],
         line=dict(color='#005b82', width=2),
         marker=dict(size=6)
     ))
     
     # Add confidence interval
     if f"{selected_metric}_low" in trend_data.columns and f"{selected_metric}_high" in trend_data.columns:
-        fig.add_trace(go.Scatter(
+        fig.add_trace(go.Scattergl(
             x=trend_data['year'],
             y=trend_data[f"{selected_metric}_high"],
             mode='lines',
             line=dict(width=0),
             showlegend=False
         ))
-        fig.add_trace(go.Scatter(
+        fig.add_trace(go.Scattergl(
             x=trend_data['year'],
             y=trend_data[f"{selected_metric}_low"],
             mode='lines',
@@ -733,34 +768,13 @@ def update_trend_chart(selected_country, selected_metric):
             name='95% Confidence Interval'
         ))
     
-    # Update layout
+    # Fill in the titles
     fig.update_layout(
-        title=dict(
-            text=title,
-            x=0.5,
-            xanchor='center'
-        ),
-        xaxis=dict(
-            title='Year',
-            gridcolor='lightgray'
-        ),
-        yaxis=dict(
-            title=f"{selected_metric.replace('_', ' ').capitalize()}",
-            gridcolor='lightgray'
-        ),
-        legend=dict(
-            orientation='h',
-            yanchor='top',
-            y=-0.15,
-            xanchor='center',
-            x=0.5
-        ),
-        plot_bgcolor='white',
-        margin=dict(l=10, r=10, t=50, b=60),
-        hovermode='x unified'
+        title=dict(text=title),
+        yaxis=dict(title=metric_labels[selected_metric])
     )
     
-    return fig
+    return fig.to_dict()
 
 # Callback for region distribution
 @callback(
@@ -769,19 +783,19 @@ def update_trend_chart(selected_country, selected_metric):
      Input('metric-selector', 'value')]
 )
 def update_region_distribution(selected_years, selected_metric):
-    start_year, end_year = int(selected_years[0]), int(selected_years[1])
-    
-    # Get filtered data using cached function
-    filtered_data = get_filtered_data(start_year, end_year)
-    
-    # Group by region and calculate the mean for the selected metric
-    agg_data = filtered_data.groupby('region')[selected_metric].mean().reset_index()
+    return build_region_distribution_figure(int(selected_years[0]), int(selected_years[1]), selected_metric)
+
+# Build the region distribution figure, cached per year range and metric
+@lru_cache(maxsize=64)
+def build_region_distribution_figure(start_year, end_year, selected_metric):
+    # Get the per-region means using cached function
+    agg_data = get_region_means(start_year, end_year)[['region', selected_metric]]
     
     # Sort by value
     agg_data = agg_data.sort_values(by=selected_metric, ascending=True)
     
     # Create the bar chart
-    fig = go.Figure()
+    fig = go.Figure(layout=region_distribution_layout)
     
     fig.add_trace(go.Bar(
         y=agg_data['region'],
@@ -793,26 +807,13 @@ def update_region_distribution(selected_years, selected_metric):
         )
     ))
     
-    # Update layout
+    # Fill in the titles
     fig.update_layout(
-        title=dict(
-            text=f'TB {selected_metric.split("_")[0].capitalize()} by Region ({start_year}-{end_year})',
-            x=0.5,
-            xanchor='center'
-        ),
-        xaxis=dict(
-            title=f"{selected_metric.replace('_', ' ').capitalize()}",
-            gridcolor='lightgray'
-        ),
-        yaxis=dict(
-            title='WHO Region',
-            gridcolor='lightgray'
-        ),
-        plot_bgcolor='white',
-        margin=dict(l=10, r=10, t=50, b=30),
+        title=dict(text=f'TB {metric_names[selected_metric]} by Region ({start_year}-{end_year})'),
+        xaxis=dict(title=metric_labels[selected_metric])
     )
     
-    return fig
+    return fig.to_dict()
 
 # Callback for data table
 @callback(
@@ -825,19 +826,17 @@ def update_table(selected_regions, selected_years):
     start_year, end_year = int(selected_years[0]), int(selected_years[1])
     
     # Get filtered data using cached function
-    filtered_data = get_filtered_data(start_year, end_year, selected_regions)
+    filtered_data = get_filtered_data(start_year, end_year, tuple(sorted(selected_regions or [])))
     
     # Group by country and calculate means
-    agg_data = filtered_data.groupby(['country', 'region']).agg({
+    agg_data = filtered_data.groupby(['country', 'region'], observed=True).agg({
         'prevalence_per_100k': 'mean',
         'mortality_per_100k': 'mean',
         'incidence_per_100k': 'mean'
     }).reset_index()
     
     # Round values to 1 decimal place
-    agg_data['prevalence_per_100k'] = agg_data['prevalence_per_100k'].round(1)
-    agg_data['mortality_per_100k'] = agg_data['mortality_per_100k'].round(1)
-    agg_data['incidence_per_100k'] = agg_data['incidence_per_100k'].round(1)
+    agg_data[key_metrics] = agg_data[key_metrics].round(1)
     
     # Create dynamic title based on selected regions
     if selected_regions and len(selected_regions) > 0:
@@ -851,7 +850,11 @@ def update_table(selected_regions, selected_years):
     else:
         title = f'Data Table - All Regions ({start_year}-{end_year})'
     
-    return agg_data.to_dict('records'), title
+    # Zip the columns as native Python lists instead of boxing every cell through to_dict('records')
+    columns = agg_data.columns.tolist()
+    records = [dict(zip(columns, row)) for row in zip(*(agg_data[column].tolist() for column in columns))]
+    
+    return records, title
 
 # Callback for comparison chart
 @callback(
@@ -860,22 +863,26 @@ def update_table(selected_regions, selected_years):
      Input('metric-selector', 'value')]
 )
 def update_comparison_chart(selected_countries, selected_metric):
+    return build_comparison_figure(tuple(selected_countries or []), selected_metric)
+
+# Build the comparison chart figure, cached per country selection and metric
+@lru_cache(maxsize=64)
+def build_comparison_figure(selected_countries, selected_metric):
     if not selected_countries:
-        return go.Figure()
-    
-    # Filter data for selected countries
-    filtered_data = tb_data[tb_data['country'].isin(selected_countries)]
+        return go.Figure().to_dict()
     
     # Create figure
     fig = go.Figure()
     
-    # Add a line for each country
+    # Add a line for each country, looked up in the country-indexed data
     for country in selected_countries:
-        country_data = filtered_data[filtered_data['country'] == country]
+        if country not in tb_indexed.index.levels[0]:
+            continue
+        country_data = tb_indexed.loc[country]
         
-        fig.add_trace(go.Scatter(
-            x=country_data['year'],
-            y=country_data[selected_metric],
+        fig.add_trace(go.Scattergl(
+            x=country_data.index.to_numpy(),
+            y=country_data[selected_metric].to_numpy(),
             mode='lines+markers',
             name=country,
             marker=dict(size=6)
@@ -884,7 +891,7 @@ def update_comparison_chart(selected_countries, selected_metric):
     # Update layout
     fig.update_layout(
         title=dict(
-            text=f'Country Comparison: {selected_metric.replace("_", " ").capitalize()}',
+            text=f'Country Comparison: {metric_labels[selected_metric]}',
             x=0.5,
             xanchor='center'
         ),
@@ -893,7 +900,7 @@ def update_comparison_chart(selected_countries, selected_metric):
             gridcolor='lightgray'
         ),
         yaxis=dict(
-            title=f"{selected_metric.replace('_', ' ').capitalize()}",
+            title=metric_labels[selected_metric],
             gridcolor='lightgray'
         ),
         plot_bgcolor='white',
@@ -908,7 +915,7 @@ def update_comparison_chart(selected_countries, selected_metric):
         hovermode='closest'
     )
     
-    return fig
+    return fig.to_dict()
 
 # Callback for region bar chart
 @callback(
@@ -916,23 +923,19 @@ def update_comparison_chart(selected_countries, selected_metric):
     [Input('year-slider', 'value')]
 )
 def update_region_bar_chart(selected_years):
-    start_year, end_year = int(selected_years[0]), int(selected_years[1])
-    
-    # Get filtered data using cached function
-    filtered_data = get_filtered_data(start_year, end_year)
-    
-    # Group by region and calculate the mean for all metrics
-    agg_data = filtered_data.groupby('region').agg({
-        'prevalence_per_100k': 'mean',
-        'mortality_per_100k': 'mean',
-        'incidence_per_100k': 'mean'
-    }).reset_index()
+    return build_region_bar_figure(int(selected_years[0]), int(selected_years[1]))
+
+# Build the region bar chart figure, cached per year range
+@lru_cache(maxsize=64)
+def build_region_bar_figure(start_year, end_year):
+    # Get the per-region means for all metrics using cached function
+    agg_data = get_region_means(start_year, end_year)
     
     # Sort by prevalence (static sorting)
     agg_data = agg_data.sort_values(by='prevalence_per_100k', ascending=False)
     
     # Create grouped bar chart
-    fig = go.Figure()
+    fig = go.Figure(layout=region_bar_layout)
     
     fig.add_trace(go.Bar(
         x=agg_data['region'],
@@ -955,35 +958,10 @@ def update_region_bar_chart(selected_years):
         marker_color='#B6E880'
     ))
     
-    # Update layout
-    fig.update_layout(
-        title=dict(
-            text=f'TB Burden by WHO Region ({start_year}-{end_year})',
-            x=0.5,
-            xanchor='center'
-        ),
-        xaxis=dict(
-            title='WHO Region',
-            tickangle=-45,
-            gridcolor='lightgray'
-        ),
-        yaxis=dict(
-            title='Rate per 100,000 population',
-            gridcolor='lightgray'
-        ),
-        barmode='group',
-        plot_bgcolor='white',
-        margin=dict(l=10, r=10, t=50, b=120),
-        legend=dict(
-            orientation='h',
-            yanchor='top',
-            y=-0.25,
-            xanchor='center',
-            x=0.5
-        )
-    )
+    # Fill in the title
+    fig.update_layout(title=dict(text=f'TB Burden by WHO Region ({start_year}-{end_year})'))
     
-    return fig
+    return fig.to_dict()
 
 # Callback for region box plot
 @callback(
@@ -992,37 +970,30 @@ def update_region_bar_chart(selected_years):
      Input('metric-selector', 'value')]
 )
 def update_region_box_plot(selected_years, selected_metric):
-    start_year, end_year = int(selected_years[0]), int(selected_years[1])
-    
+    return build_region_box_figure(int(selected_years[0]), int(selected_years[1]), selected_metric)
+
+# Build the region box plot figure, cached per year range and metric
+@lru_cache(maxsize=64)
+def build_region_box_figure(start_year, end_year, selected_metric):
     # Get filtered data using cached function
     filtered_data = get_filtered_data(start_year, end_year)
     
-    # Create the box plot
-    fig = px.box(
-        filtered_data,
-        x='region',
-        y=selected_metric,
-        color='region',
-        title=f'Distribution of {selected_metric.replace("_", " ").capitalize()} by Region ({start_year}-{end_year})'
-    )
+    # Create the box plot with one box per region
+    fig = go.Figure(layout=region_box_layout)
     
-    # Update layout
+    for region, values in filtered_data.groupby('region', observed=True, sort=False)[selected_metric]:
+        fig.add_trace(go.Box(
+            y=values.to_numpy(),
+            name=region
+        ))
+    
+    # Fill in the titles
     fig.update_layout(
-        xaxis=dict(
-            title='WHO Region',
-            tickangle=-45,
-            gridcolor='lightgray'
-        ),
-        yaxis=dict(
-            title=f"{selected_metric.replace('_', ' ').capitalize()}",
-            gridcolor='lightgray'
-        ),
-        plot_bgcolor='white',
-        margin=dict(l=10, r=10, t=50, b=80),
-        showlegend=False
+        title=f'Distribution of {metric_labels[selected_metric]} by Region ({start_year}-{end_year})',
+        yaxis=dict(title=metric_labels[selected_metric])
     )
     
-    return fig
+    return fig.to_dict()
 
 # Callback for year-over-year changes
 @callback(
@@ -1031,15 +1002,23 @@ def update_region_box_plot(selected_years, selected_metric):
      Input('metric-selector', 'value')]
 )
 def update_yoy_changes(selected_regions, selected_metric):
-    # Get all years of data but filter by region if selected
-    filtered_data = get_filtered_data(min(years), max(years), selected_regions)
+    return build_yoy_figure(tuple(selected_regions or []), selected_metric)
+
+# Build the year-over-year changes figure, cached per region selection and metric
+@lru_cache(maxsize=64)
+def build_yoy_figure(selected_regions, selected_metric):
+    # Get the per-region yearly sums and counts, filtered by region if selected
+    sums = region_year_sums[selected_metric]
+    counts = region_year_counts[selected_metric]
+    if selected_regions and len(selected_regions) > 0:
+        in_regions = sums.index.get_level_values('region').isin(selected_regions)
+        sums, counts = sums[in_regions], counts[in_regions]
     
-    # Group by year and calculate global means
-    yearly_data = filtered_data.groupby('year')[selected_metric].mean().reset_index()
+    # Combine the selected regions into yearly means
+    yearly_data = (sums.groupby(level='year').sum() / counts.groupby(level='year').sum()).rename(selected_metric).reset_index()
     
-    # Calculate year-over-year changes
-    yearly_data['prev_value'] = yearly_data[selected_metric].shift(1)
-    yearly_data['yoy_change'] = ((yearly_data[selected_metric] - yearly_data['prev_value']) / yearly_data['prev_value'] * 100)
+    # Calculate year-over-year changes on the NumPy array of yearly means
+    yearly_data['yoy_change'] = yoy_percent(yearly_data[selected_metric].to_numpy(dtype='float64'))
     
     # Remove first row with NaN
     yearly_data = yearly_data.dropna()
@@ -1047,15 +1026,13 @@ def update_yoy_changes(selected_regions, selected_metric):
     # Create the bar chart
     fig = go.Figure()
     
-    # Add bars with color based on positive/negative change
-    for i, row in yearly_data.iterrows():
-        color = '#00AA00' if row['yoy_change'] <= 0 else '#AA0000'
-        fig.add_trace(go.Bar(
-            x=[row['year']],
-            y=[row['yoy_change']],
-            marker_color=color,
-            showlegend=False
-        ))
+    # Add all bars as one trace, colored by positive/negative change
+    fig.add_trace(go.Bar(
+        x=yearly_data['year'],
+        y=yearly_data['yoy_change'],
+        marker_color=np.where(yearly_data['yoy_change'].to_numpy() <= 0, '#00AA00', '#AA0000'),
+        showlegend=False
+    ))
     
     # Add reference line at y=0
     fig.add_shape(
@@ -1068,7 +1045,7 @@ def update_yoy_changes(selected_regions, selected_metric):
     )
     
     # Create dynamic title based on selected regions
-    base_title = f'Year-over-Year % Change in {selected_metric.replace("_", " ").capitalize()}'
+    base_title = f'Year-over-Year % Change in {metric_labels[selected_metric]}'
     if selected_regions and len(selected_regions) > 0:
         if len(selected_regions) == 1:
             title = f'{base_title} - {selected_regions[0]}'
@@ -1101,10 +1078,9 @@ def update_yoy_changes(selected_regions, selected_metric):
         hovermode='x unified'
     )
     
-    return fig
+    return fig.to_dict()
 
 if __name__ == '__main__':
     # For production deployment
-    import os
     port = int(os.environ.get('PORT', 8050))
     app.run(debug=False, host='0.0.0.0', port=port)
\ No newline at end of file
@@ -6,9 +6,14 @@ from folium.plugins import HeatMap, MarkerCluster
 # Load the TB data
 tb_data = pd.read_csv('1-TB_Burden_Country.csv')
 
-# Load the geographic data
-with open('world-countries.json', 'r') as file:
-    geo_data = json.load(file)
+# Load the geographic data (orjson's C parser is much faster than the json module when installed)
+try:
+    import orjson
+    with open('world-countries.json', 'rb') as file:
+        geo_data = orjson.loads(file.read())
+except ImportError:
+    with open('world-countries.json', 'r') as file:
+        geo_data = json.load(file)
 
 # Clean and preprocess the data
 tb_data.rename(columns={
@@ -22,6 +27,10 @@ tb_data.rename(columns={
     'Estimated incidence (all forms) per 100 000 population': 'incidence_per_100k'
 }, inplace=True)
 
+# Store the repeated text columns as categoricals so filtering works on integer codes
+tb_data['country'] = tb_data['country'].astype('category')
+tb_data['region'] = tb_data['region'].astype('category')
+
 # Get the latest available year in the dataset
 latest_year = tb_data['year'].max()
 
@@ -66,7 +75,7 @@ choropleth.geojson.add_child(
 marker_cluster = MarkerCluster().add_to(tb_map)
 
 # Add markers for countries with high TB prevalence (top 20)
-top_countries = latest_data.sort_values(by='prevalence_per_100k', ascending=False).head(20)
+top_countries = latest_data.nlargest(20, 'prevalence_per_100k')
 
 # We need to get approximate coordinates for these countries (this is a simplification)
 # In a real application, you would use a geocoding service or a proper dataset with coordinates
@@ -94,21 +103,25 @@ country_coords = {
     # Add more countries if needed
 }
 
-for _, row in top_countries.iterrows():
-    country = row['country']
-    if country in country_coords:
-        folium.Marker(
-            location=country_coords[country],
-            popup=folium.Popup(f"""
-                <b>Country:</b> {row['country']}<br>
-                <b>Region:</b> {row['region']}<br>
-                <b>TB Prevalence:</b> {row['prevalence_per_100k']:.1f} per 100,000<br>
-                <b>TB Mortality:</b> {row['mortality_per_100k']:.1f} per 100,000<br>
-                <b>TB Incidence:</b> {row['incidence_per_100k']:.1f} per 100,000<br>
-            """, max_width=300),
-            tooltip=f"{country}: {row['prevalence_per_100k']:.1f} per 100,000",
-            icon=folium.Icon(color='red', icon='info-sign')
-        ).add_to(marker_cluster)
+# Join the coordinates onto the top countries, dropping the ones we have no coordinates for
+coords_df = pd.DataFrame.from_dict(country_coords, orient='index', columns=['lat', 'lon']).rename_axis('country').reset_index()
+marker_data = top_countries.merge(coords_df, on='country', how='inner')
+
+# Iterate over plain tuples of the needed columns instead of building a Series per row
+marker_columns = ['country', 'region', 'prevalence_per_100k', 'mortality_per_100k', 'incidence_per_100k', 'lat', 'lon']
+for country, region, prevalence, mortality, incidence, lat, lon in marker_data[marker_columns].itertuples(index=False, name=None):
+    folium.Marker(
+        location=[lat, lon],
+        popup=folium.Popup(f"""
+            <b>Country:</b> {country}<br>
+            <b>Region:</b> {region}<br>
+            <b>TB Prevalence:</b> {prevalence:.1f} per 100,000<br>
+            <b>TB Mortality:</b> {mortality:.1f} per 100,000<br>
+            <b>TB Incidence:</b> {incidence:.1f} per 100,000<br>
+        """, max_width=300),
+        tooltip=f"{country}: {prevalence:.1f} per 100,000",
+        icon=folium.Icon(color='red', icon='info-sign')
+    ).add_to(marker_cluster)
 
 # Add a layer control panel
 folium.LayerControl().add_to(tb_map)
@@ -148,8 +161,8 @@ years = sorted(region_data['year'].unique())
 # Create a base map for the region
 region_map = folium.Map(location=[0, 20], zoom_start=3, tiles="CartoDB positron")
 
-# Add year selector
-year_selector_html = """
+# Add year selector (the pieces are collected in a list and joined once at the end)
+year_selector_parts = ["""
 <div style='position: fixed; 
             top: 10px; right: 10px; 
             z-index: 9999; 
@@ -159,24 +172,21 @@ year_selector_html = """
             box-shadow: 0 0 15px rgba(0, 0, 0, 0.2);'>
     <h4>Select Year:</h4>
     <select id="year-selector" onchange="updateYear(this.value)">
-"""
+"""]
 
-for year in years:
-    year_selector_html += f'<option value="{year}">{year}</option>'
+year_selector_parts.extend(f'<option value="{year}">{year}</option>' for year in years)
 
-year_selector_html += """
+year_selector_parts.append("""
     </select>
 </div>
 
 <script>
     var layers = {};
-"""
+""")
 
-for year in years:
-    year_data = region_data[region_data['year'] == year]
-    year_selector_html += f'layers["{year}"] = L.layerGroup();'
+year_selector_parts.extend(f'layers["{year}"] = L.layerGroup();' for year in years)
 
-year_selector_html += """
+year_selector_parts.append("""
     function updateYear(year) {
         for (var y in layers) {
             map.removeLayer(layers[y]);
@@ -186,7 +196,9 @@ year_selector_html += """
     
     updateYear(\"""" + str(years[-1]) + """\");
 </script>
-"""
+""")
+
+year_selector_html = ''.join(year_selector_parts)
 
 region_map.get_root().html.add_child(folium.Element(year_selector_html))
 